@@ -9,8 +9,30 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.views.static import serve
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_project.settings')
+os.environ.setdefault('ASGI_MODE', 'True')
 
-application = get_asgi_application()
+
+class StaticRootFilesHandler(ASGIStaticFilesHandler):
+    """
+    Serves STATIC_URL straight from STATIC_ROOT (the collectstatic output, so
+    the hashed names the manifest storage puts in templates resolve). This
+    replaces WhiteNoise under ASGI, leaving API requests a fully async
+    middleware chain.
+    """
+    def serve(self, request):
+        try:
+            return serve(request, self.file_path(request.path), document_root=settings.STATIC_ROOT)
+        except SuspiciousFileOperation:
+            # A path escaping STATIC_ROOT (/static/../x); the handler only turns Http404 into a response
+            raise Http404('Invalid path')
+
+
+application = StaticRootFilesHandler(get_asgi_application())
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'website.middleware.APICompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -71,9 +72,21 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ecommerce_project.wsgi.application'
 
+# Set by asgi.py. When True the read endpoints are served by the async views
+# in website/async_views.py instead of their DRF equivalents.
+ASGI_MODE = config('ASGI_MODE', default=False, cast=bool)
+if ASGI_MODE:
+    # WhiteNoise is sync-only and would push every request through a thread.
+    # asgi.py serves the collected static files instead, outside the middleware.
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 DATABASES = {
     'default': dj_database_url.parse(config('DATABASE_URL'))
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Tests default to in-memory SQLite, which can't run the concurrent-request
+    # tests (a blocked write fails with "table is locked" instead of waiting)
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -98,13 +111,50 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'website.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 8,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    # Token-bucket sizes per endpoint, see website/throttling.py
+    'DEFAULT_THROTTLE_RATES': {
+        'register': config('THROTTLE_REGISTER_RATE', default='5/hour'),
+        'login': config('THROTTLE_LOGIN_RATE', default='10/min'),
+        'payment': config('THROTTLE_PAYMENT_RATE', default='20/min'),
+    },
+    # Proxies in front of the app that append to X-Forwarded-For (Render's load
+    # balancer is one). Throttles then use the address the last proxy saw, not
+    # whatever the client put in the header.
+    'NUM_PROXIES': config('NUM_PROXIES', default=1, cast=int),
 }
 
+# Throttle state is shared between workers through Redis when it is configured.
+# Without it every worker keeps its own in-memory cache.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# API responses smaller than this (bytes) aren't worth compressing
+API_COMPRESSION_MIN_SIZE = config('API_COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
+# How long stored Idempotency-Key responses are kept, see website/idempotency.py
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
 
@@ -1,46 +1,68 @@
 # ecommerce_project/urls.py (Final, Simplified, and Correct Version)
 
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
 # Import all your views in a clean, grouped block
 from website.views import (
     ProductAPIView, 
     ProductDetailAPIView, 
+    RelatedProductsAPIView,
     CategoryListAPIView, 
     RegisterView, 
     CustomAuthToken,
     OrderCreateAPIView, 
     OrderListAPIView,
     OrderCancelAPIView,
+    OrderBulkStatusAPIView,
     AllProductsAPIView,
     CollectionListView,
     CollectionDetailView,
     CreatePaymentIntentView
 )
 
+from website import async_views
+
+# Under ASGI the read endpoints use the async ORM (see website/async_views.py)
+if settings.ASGI_MODE:
+    ProductListView = async_views.AsyncProductAPIView
+    OrderListView = async_views.AsyncOrderListAPIView
+    CollectionsView = async_views.AsyncCollectionListView
+    CollectionView = async_views.AsyncCollectionDetailView
+else:
+    ProductListView = ProductAPIView
+    OrderListView = OrderListAPIView
+    CollectionsView = CollectionListView
+    CollectionView = CollectionDetailView
+
 urlpatterns = [
     # The Admin URL
     path('admin/', admin.site.urls),
 
     # --- API URLs ---
-    path('api/products/', ProductAPIView.as_view(), name='product-api-list'),
+    path('api/products/', ProductListView.as_view(), name='product-api-list'),
     path('api/products/all/', AllProductsAPIView.as_view(), name='all-products-api'),
     path('api/products/<int:pk>/', ProductDetailAPIView.as_view(), name='product-api-detail'),
+    path('api/products/<int:pk>/related/', RelatedProductsAPIView.as_view(), name='product-api-related'),
     
     path('api/categories/', CategoryListAPIView.as_view(), name='category-api-list'),
     
-    path('api/collections/', CollectionListView.as_view(), name='collection-list-api'),
-    path('api/collections/<slug:slug>/', CollectionDetailView.as_view(), name='collection-detail-api'),
+    path('api/collections/', CollectionsView.as_view(), name='collection-list-api'),
+    path('api/collections/<slug:slug>/', CollectionView.as_view(), name='collection-detail-api'),
     
     path('api/register/', RegisterView.as_view(), name='register-api'),
     path('api/login/', CustomAuthToken.as_view(), name='login-api'),
     
-    path('api/orders/', OrderListAPIView.as_view(), name='order-list-api'),
+    path('api/orders/', OrderListView.as_view(), name='order-list-api'),
     path('api/orders/create/', OrderCreateAPIView.as_view(), name='order-create-api'),
     path('api/orders/<int:pk>/cancel/', OrderCancelAPIView.as_view(), name='order-cancel-api'),
+    path('api/orders/bulk-status/', OrderBulkStatusAPIView.as_view(), name='order-bulk-status-api'),
     
     path('api/create-payment-intent/', CreatePaymentIntentView.as_view(), name='create-payment-intent'),
+
+    # Server-rendered storefront, kept as a fallback for when the frontend is down
+    path('shop/', include('website.urls')),
 ]
 
 # We DO NOT need the static() helper for production when using WhiteNoise.
@@ -0,0 +1,14 @@
+#!/usr/bin/env bash
+# exit on error
+set -o errexit
+
+# SERVER_MODE=asgi runs uvicorn workers under gunicorn and serves the read
+# endpoints from the async views. asgi.py sets ASGI_MODE, which drops
+# WhiteNoise (it is sync-only) and serves the collected static files itself, without
+# WhiteNoise's compression or far-future caching. Anything else keeps the
+# plain WSGI setup.
+if [ "$SERVER_MODE" = "asgi" ]; then
+    exec gunicorn ecommerce_project.asgi:application -k uvicorn_worker.UvicornWorker
+else
+    exec gunicorn ecommerce_project.wsgi:application
+fi
@@ -1,8 +1,11 @@
 # website/admin.py (Final Enhanced Version with Order Item Images)
 
-from django.contrib import admin
-from django.utils.html import format_html
-from .models import Category, Product, Order, OrderItem, Collection
+from django.contrib import admin, messages
+from django.utils.html import format_html, format_html_join
+from .models import (
+    Category, Product, Order, OrderItem, OrderStatusHistory, Collection,
+    ArchivedOrder, ArchivedOrderItem,
+)
 
 # --- Category Admin ---
 @admin.register(Category)
@@ -59,10 +62,91 @@ class OrderItemInline(admin.TabularInline):
     image_tag.short_description = 'Product Image'
 
 
+class OrderStatusHistoryInline(admin.TabularInline):
+    model = OrderStatusHistory
+    fields = ('from_status', 'to_status', 'changed_by', 'changed_at')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def make_status_action(new_status, label):
+    """
+    Builds an admin action that moves the selected orders to new_status in
+    one UPDATE. Orders that can't make that transition are left alone.
+    """
+    def action(modeladmin, request, queryset):
+        updated, skipped = Order.bulk_transition(
+            queryset.values_list('id', flat=True), new_status, changed_by=request.user
+        )
+        modeladmin.message_user(request, f"{len(updated)} order(s) marked as {label.lower()}.")
+        if skipped:
+            modeladmin.message_user(
+                request,
+                f"{len(skipped)} order(s) skipped, they can't be marked as {label.lower()} from their current status.",
+                level=messages.WARNING,
+            )
+
+    action.__name__ = f'mark_{new_status}'
+    action.short_description = f'Mark selected orders as {label.lower()}'
+    return action
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'status', 'paid', 'created']
     list_filter = ['status', 'paid', 'created']
     search_fields = ['user__username', 'id']
-    inlines = [OrderItemInline]
-    list_editable = ['status']
\ No newline at end of file
+    inlines = [OrderItemInline, OrderStatusHistoryInline]
+    # Status changes go through the actions below so they are validated,
+    # batched into one UPDATE and recorded in the status history.
+    readonly_fields = ['status']
+    actions = [
+        make_status_action('shipped', 'Shipped'),
+        make_status_action('delivered', 'Delivered'),
+        make_status_action('cancelled', 'Cancelled'),
+    ]
+
+# --- Archived Orders (read-only, filled by `manage.py archive_orders`) ---
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    fields = ('product', 'price', 'quantity')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'status', 'paid', 'created', 'archived']
+    list_filter = ['status', 'created']
+    search_fields = ['user__username', 'id']
+    inlines = [ArchivedOrderItemInline]
+    readonly_fields = ['status_history']
+
+    @admin.display(description='Status history')
+    def status_history(self, obj):
+        # The history rows keep pointing at the order id after archiving,
+        # but their foreign key is to Order, so they can't be an inline here
+        history = OrderStatusHistory.objects.filter(order_id=obj.pk).select_related('changed_by')
+        return format_html_join(
+            format_html('<br>'), '{}: {} &rarr; {} ({})',
+            (
+                (f'{h.changed_at:%Y-%m-%d %H:%M}', h.get_from_status_display(),
+                 h.get_to_status_display(), h.changed_by or '-')
+                for h in history
+            ),
+        ) or '-'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
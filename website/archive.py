@@ -0,0 +1,89 @@
+# website/archive.py
+#
+# Moving old orders out of the hot Order/OrderItem tables, and reading a
+# user's history back across both the hot and the archive tables.
+
+from django.db import transaction
+from django.db.models import Value
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVABLE_STATUSES = ['delivered', 'cancelled']
+
+
+def _copy(instance, model):
+    # The archive models have the same columns, so copy by attname (user_id, product_id, ...)
+    return model(**{
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    })
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Moves up to batch_size delivered/cancelled orders created before cutoff,
+    with their items, into the archive tables. Returns how many were moved.
+    Each batch is its own transaction, so an interrupted run loses nothing
+    and can simply be restarted.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(status__in=ARCHIVABLE_STATUSES, created__lt=cutoff)
+            .order_by('id')[:batch_size]
+        )
+        if not orders:
+            return 0
+
+        order_ids = [order.id for order in orders]
+        items = list(OrderItem.objects.filter(order_id__in=order_ids))
+
+        ArchivedOrder.objects.bulk_create([_copy(order, ArchivedOrder) for order in orders])
+        ArchivedOrderItem.objects.bulk_create([_copy(item, ArchivedOrderItem) for item in items])
+
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+
+    return len(orders)
+
+
+def order_history(user):
+    """
+    A user's live and archived orders as one queryset of (id, created, is_archived)
+    rows, newest first. It can be counted and sliced (so paginated) without
+    loading any orders; pass a page of it to load_orders().
+    """
+    live = (
+        Order.objects.filter(user=user)
+        .annotate(is_archived=Value(False))
+        .values_list('id', 'created', 'is_archived')
+        .order_by()  # the parts of a UNION can't have their own ORDER BY
+    )
+    archived = (
+        ArchivedOrder.objects.filter(user=user)
+        .annotate(is_archived=Value(True))
+        .values_list('id', 'created', 'is_archived')
+        .order_by()
+    )
+    return live.union(archived, all=True).order_by('-created', '-id')
+
+
+def load_orders(rows):
+    """
+    Turns rows from order_history() into Order/ArchivedOrder instances with
+    their items and products prefetched, keeping the rows' order.
+    """
+    live_ids = [order_id for order_id, _, is_archived in rows if not is_archived]
+    archived_ids = [order_id for order_id, _, is_archived in rows if is_archived]
+
+    loaded = {}
+    if live_ids:
+        for order in Order.objects.filter(id__in=live_ids).prefetch_related('items__product'):
+            loaded[(order.id, False)] = order
+    if archived_ids:
+        for order in ArchivedOrder.objects.filter(id__in=archived_ids).prefetch_related('items__product'):
+            loaded[(order.id, True)] = order
+
+    # An order archived between counting and loading is simply left out
+    keys = [(order_id, bool(is_archived)) for order_id, _, is_archived in rows]
+    return [loaded[key] for key in keys if key in loaded]
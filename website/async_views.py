@@ -0,0 +1,156 @@
+# website/async_views.py
+#
+# Async versions of the read-only endpoints, used when the app is served
+# over ASGI (see ecommerce_project/asgi.py). DRF's APIView is synchronous,
+# so these are plain Django views that do the database work with the async
+# ORM and reuse the existing serializers to build the exact same JSON.
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .archive import load_orders, order_history
+from .models import Category, Collection, Product
+from .serializers import (
+    CollectionDetailSerializer,
+    CollectionSerializer,
+    OrderHistorySerializer,
+    ProductSerializer,
+)
+
+
+async def paginate(request, queryset, serializer_class, load=None):
+    """
+    Same response shape as DRF's PageNumberPagination:
+    {"count", "next", "previous", "results"}
+    If given, load turns the rows of the page into the objects to serialize.
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    count = await queryset.acount()
+    num_pages = max(1, -(-count // page_size))
+
+    # As PageNumberPagination: an empty ?page= is page 1 and 'last' the last one
+    page = request.GET.get(PageNumberPagination.page_query_param) or 1
+    if page in PageNumberPagination.last_page_strings:
+        page = num_pages
+    try:
+        page = int(page)
+    except ValueError:
+        page = 0
+    if page < 1 or page > num_pages:
+        return JsonResponse({'detail': 'Invalid page.'}, status=404)
+
+    offset = (page - 1) * page_size
+    results = [obj async for obj in queryset[offset:offset + page_size]]
+    if load is not None:
+        results = await sync_to_async(load)(results)
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page + 1) if page < num_pages else None
+    if page <= 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page - 1)
+
+    return JsonResponse({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': serializer_class(results, many=True, context={'request': request}).data,
+    })
+
+
+async def get_token_user(request):
+    """
+    Async equivalent of rest_framework.authentication.TokenAuthentication.
+    Returns (user, None) on success or (None, error_response).
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b'token':
+        return None, _unauthorized('Authentication credentials were not provided.')
+    if len(auth) == 1:
+        return None, _unauthorized('Invalid token header. No credentials provided.')
+    if len(auth) > 2:
+        return None, _unauthorized('Invalid token header. Token string should not contain spaces.')
+
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None, _unauthorized('Invalid token header. Token string should not contain invalid characters.')
+
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        return None, _unauthorized('Invalid token.')
+
+    if not token.user.is_active:
+        return None, _unauthorized('User inactive or deleted.')
+    return token.user, None
+
+
+def _unauthorized(detail):
+    response = JsonResponse({'detail': detail}, status=401)
+    response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+class AsyncProductAPIView(View):
+    async def get(self, request, *args, **kwargs):
+        queryset = Product.objects.filter(available=True)
+
+        category = request.GET.get('category')
+        if category:
+            valid = category.isdigit() and await Category.objects.filter(pk=category).aexists()
+            if not valid:
+                return JsonResponse({'category': [
+                    'Select a valid choice. That choice is not one of the available choices.'
+                ]}, status=400)
+            queryset = queryset.filter(category_id=category)
+
+        return await paginate(request, queryset, ProductSerializer)
+
+
+class AsyncCollectionListView(View):
+    async def get(self, request, *args, **kwargs):
+        queryset = Collection.objects.filter(is_active=True)
+
+        gender_category = request.GET.get('gender_category')
+        if gender_category:
+            if gender_category not in dict(Collection.GENDER_CHOICES):
+                return JsonResponse({'gender_category': [
+                    f'Select a valid choice. {gender_category} is not one of the available choices.'
+                ]}, status=400)
+            queryset = queryset.filter(gender_category=gender_category)
+
+        collections = [collection async for collection in queryset]
+        return JsonResponse(CollectionSerializer(collections, many=True).data, safe=False)
+
+
+class AsyncCollectionDetailView(View):
+    async def get(self, request, slug, *args, **kwargs):
+        try:
+            collection = await (
+                Collection.objects.filter(is_active=True)
+                .prefetch_related('products')
+                .aget(slug=slug)
+            )
+        except Collection.DoesNotExist:
+            return JsonResponse({'detail': 'No Collection matches the given query.'}, status=404)
+        return JsonResponse(CollectionDetailSerializer(collection, context={'request': request}).data)
+
+
+class AsyncOrderListAPIView(View):
+    async def get(self, request, *args, **kwargs):
+        user, error = await get_token_user(request)
+        if error:
+            return error
+
+        # Live and archived orders, see website/archive.py
+        return await paginate(request, order_history(user), OrderHistorySerializer, load=load_orders)
@@ -0,0 +1,79 @@
+# website/idempotency.py
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+class IdempotentCreateMixin:
+    """
+    Makes a CreateAPIView safe to retry. When the client sends an
+    Idempotency-Key header, the first successful response is stored and any
+    later request with the same key gets that response back instead of
+    running create() again.
+
+    The key row is inserted in the same transaction as the object it
+    creates. A duplicate that arrives while the first request is still
+    running blocks on the unique (user, key) index until that transaction
+    ends, then either replays the stored response (first one committed) or
+    goes ahead itself (first one failed and rolled back). Failed requests
+    are never stored, so the client can fix the request and retry. Keys
+    older than IDEMPOTENCY_KEY_TTL_HOURS have expired and are treated as new.
+    """
+    idempotency_header = 'Idempotency-Key'
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": "Idempotency-Key must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        with transaction.atomic():
+            try:
+                record = self.store_key(request.user, key, request_hash)
+            except IntegrityError:
+                if not self.delete_expired(request.user, key):
+                    return self.replay(request.user, key, request_hash)
+                # clear_idempotency_keys hadn't got to it yet; start afresh
+                record = self.store_key(request.user, key, request_hash)
+
+            response = super().create(request, *args, **kwargs)
+            record.response_status = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['response_status', 'response_body'])
+        return response
+
+    def store_key(self, user, key, request_hash):
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, request_hash=request_hash)
+
+    def delete_expired(self, user, key):
+        cutoff = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        deleted, _ = IdempotencyKey.objects.filter(user=user, key=key, created__lt=cutoff).delete()
+        return deleted
+
+    def replay(self, user, key, request_hash):
+        record = IdempotencyKey.objects.get(user=user, key=key)
+        if record.request_hash != request_hash:
+            return Response(
+                {"error": "This Idempotency-Key was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            record.response_body,
+            status=record.response_status,
+            headers={'Idempotent-Replayed': 'true'},
+        )
@@ -0,0 +1,117 @@
+# website/images.py
+#
+# Resized WebP/JPEG variants of Collection.image, so the homepage can send
+# each client an image sized for its screen instead of the full original.
+# Variants are generated off the request thread in a small thread pool and
+# recorded in Collection.image_variants as {format: {width: storage name}}.
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+VARIANT_FORMATS = {
+    # format: (Pillow format, extension, save options)
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-variants')
+    return _executor
+
+
+def variant_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{width}w.{extension}'
+
+
+def render_variants(original):
+    """
+    Yields (format, width, bytes) for every variant of a Pillow image.
+    Images are never upscaled; an original narrower than a target width
+    gets one variant at its own width instead.
+    """
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(original)
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+
+        for fmt, (pillow_format, _, options) in VARIANT_FORMATS.items():
+            frame = resized
+            if pillow_format == 'JPEG' and frame.mode != 'RGB':
+                # JPEG has no alpha channel, flatten onto white
+                background = Image.new('RGB', frame.size, (255, 255, 255))
+                if frame.mode in ('RGBA', 'LA', 'P'):
+                    frame = frame.convert('RGBA')
+                    background.paste(frame, mask=frame.split()[-1])
+                else:
+                    background.paste(frame.convert('RGB'))
+                frame = background
+            buffer = BytesIO()
+            frame.save(buffer, pillow_format, **options)
+            yield fmt, width, buffer.getvalue()
+
+
+def generate_collection_variants(collection_id, stale_names=()):
+    """
+    Builds the variants for one collection's current image and saves them
+    next to the original. Safe to run again; existing files are replaced.
+    """
+    from PIL import Image
+
+    from .models import Collection
+
+    try:
+        for name in stale_names:
+            Collection.image.field.storage.delete(name)
+
+        collection = Collection.objects.filter(pk=collection_id).first()
+        if collection is None or not collection.image:
+            return
+
+        name = collection.image.name
+        storage = collection.image.storage
+        variants = {fmt: {} for fmt in VARIANT_FORMATS}
+
+        with storage.open(name, 'rb') as original_file:
+            original = Image.open(original_file)
+            original.load()
+
+        for fmt, width, content in render_variants(original):
+            target = variant_name(name, width, VARIANT_FORMATS[fmt][1])
+            if storage.exists(target):
+                storage.delete(target)
+            variants[fmt][str(width)] = storage.save(target, ContentFile(content))
+
+        # Only record them if the image wasn't replaced while we were working
+        Collection.objects.filter(pk=collection_id, image=name).update(image_variants=variants)
+    except Exception:
+        logger.exception("Could not generate image variants for collection %s", collection_id)
+
+
+def _generate_in_background(collection_id, stale_names):
+    try:
+        generate_collection_variants(collection_id, stale_names)
+    finally:
+        # Worker threads get their own database connection; don't leak it
+        connection.close()
+
+
+def queue_collection_variants(collection_id, stale_names=()):
+    _get_executor().submit(_generate_in_background, collection_id, list(stale_names))
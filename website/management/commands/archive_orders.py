@@ -0,0 +1,41 @@
+# website/management/commands/archive_orders.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from website.archive import ARCHIVABLE_STATUSES, archive_batch
+from website.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves delivered and cancelled orders older than --days into the "
+        "archive tables, in batches. Users still see them in their order history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180,
+                            help="Archive orders created more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report how many orders would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        if options['dry_run']:
+            count = Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created__lt=cutoff).count()
+            self.stdout.write(f"{count} order(s) created before {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        total = 0
+        while True:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f"Archived {total} order(s)...")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {total} order(s) archived."))
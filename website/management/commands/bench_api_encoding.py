@@ -0,0 +1,69 @@
+# website/management/commands/bench_api_encoding.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from website.middleware import brotli, compress
+from website.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares render time and bytes on the wire for a product listing "
+        "rendered with DRF's JSONRenderer vs FastJSONRenderer, compressed "
+        "with gzip/brotli, and trimmed with ?fields=."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500,
+                            help="Products in the listing (AllProductsAPIView is unpaginated).")
+        parser.add_argument('--description-length', type=int, default=800)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        # Same shape as ProductSerializer output
+        words = 'soft cotton relaxed fit tiger print machine washable limited run '.split()
+        length = options['description_length'] // 6
+
+        def description(seed):
+            # Varies per product so compression isn't flattered by identical rows
+            return ' '.join(words[(i * seed + i // 3) % len(words)] for i in range(length))
+
+        data = [
+            {
+                'id': i,
+                'name': f'Product {i}',
+                'price': f'{i % 90 + 10}.00',
+                'description': description(i % 7 + 1),
+                'image_url': f'https://res.cloudinary.com/demo/image/upload/v1/products/{i}.jpg',
+            }
+            for i in range(options['products'])
+        ]
+        sparse = [{key: row[key] for key in ('id', 'name', 'price', 'image_url')} for row in data]
+
+        self.stdout.write(f"orjson installed: {orjson is not None}")
+        self.stdout.write("")
+        self.stdout.write(f"{'renderer':<20} {'ms/render':>10}")
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                renderer.render(data)
+            elapsed = (time.perf_counter() - start) / options['repeat']
+            self.stdout.write(f"{renderer.__class__.__name__:<20} {elapsed * 1000:>10.2f}")
+
+        encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+        self.stdout.write("")
+        self.stdout.write(f"{'payload':<20} {'encoding':<10} {'bytes':>10} {'ms/compress':>12}")
+        for label, payload in (('full', data), ('?fields=id,name,...', sparse)):
+            body = FastJSONRenderer().render(payload)
+            for encoding in encodings:
+                if encoding == 'identity':
+                    self.stdout.write(f"{label:<20} {encoding:<10} {len(body):>10} {'-':>12}")
+                    continue
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    compressed = compress(body, encoding)
+                elapsed = (time.perf_counter() - start) / options['repeat']
+                self.stdout.write(f"{label:<20} {encoding:<10} {len(compressed):>10} {elapsed * 1000:>12.2f}")
@@ -0,0 +1,92 @@
+# website/management/commands/bench_concurrency.py
+
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests a running server with increasing numbers of concurrent "
+        "connections. Run it once against the WSGI deployment and once against "
+        "SERVER_MODE=asgi (both with a single worker) to compare how many "
+        "connections each sustains."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="e.g. http://127.0.0.1:8000/api/collections/")
+        parser.add_argument('--levels', default='1,10,50,100,250,500',
+                            help="Comma separated concurrency levels to try.")
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help="Seconds to run each level for.")
+        parser.add_argument('--max-p99', type=float, default=1000.0,
+                            help="A level counts as sustained if p99 latency (ms) stays below this and nothing fails.")
+        parser.add_argument('--token', default='', help="Token for authenticated endpoints.")
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['levels'].split(',')]
+        sustained = 0
+
+        self.stdout.write(f"{'conns':>6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for level in levels:
+            latencies, errors, elapsed = asyncio.run(
+                self.run_level(options['url'], options['token'], level, options['duration'])
+            )
+            if latencies:
+                latencies.sort()
+                p50 = statistics.median(latencies)
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            else:
+                p50 = p99 = float('inf')
+            self.stdout.write(
+                f"{level:>6} {len(latencies) / elapsed:>9.1f} {p50:>8.1f} {p99:>8.1f} {errors:>7}"
+            )
+            if errors == 0 and p99 < options['max_p99']:
+                sustained = level
+
+        self.stdout.write(f"sustained concurrent connections: {sustained}")
+
+    async def run_level(self, url, token, connections, duration):
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(self.fetch(url, token), timeout=30)
+                except (OSError, IndexError, ValueError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                if status != 200:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(connections)))
+        return latencies, errors, time.perf_counter() - start
+
+    async def fetch(self, url, token):
+        # Bare HTTP/1.1 so the benchmark needs nothing beyond the stdlib.
+        # One request per connection: gunicorn's sync worker does not keep
+        # connections alive, so this keeps the comparison fair.
+        parts = urlsplit(url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        headers = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close']
+        if token:
+            headers.append(f'Authorization: Token {token}')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+        await writer.drain()
+        try:
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
@@ -0,0 +1,50 @@
+# website/management/commands/bench_throttle.py
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from website.throttling import LoginRateThrottle
+
+
+class Command(BaseCommand):
+    help = "Measures the overhead the token-bucket throttle adds to each request."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10000)
+        parser.add_argument('--clients', type=int, default=100,
+                            help="Number of distinct client IPs to spread requests over.")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        clients = options['clients']
+
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(clients):
+            request = Request(factory.post('/api/login/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'))
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        # A huge rate keeps every check on the "allowed" path, which is the
+        # one real traffic takes and the one that writes to the cache.
+        throttle = LoginRateThrottle()
+        throttle.rate = f'{iterations * 10}/s'
+        throttle.num_requests, throttle.duration = throttle.parse_rate(throttle.rate)
+
+        cache.clear()
+        start = time.perf_counter()
+        for i in range(iterations):
+            throttle.allow_request(requests[i % clients], None)
+        elapsed = time.perf_counter() - start
+
+        backend = settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]
+        self.stdout.write(f"backend:      {backend}")
+        self.stdout.write(f"iterations:   {iterations}")
+        self.stdout.write(f"per request:  {elapsed / iterations * 1e6:.1f} us")
+        self.stdout.write(f"throughput:   {iterations / elapsed:,.0f} checks/s")
@@ -0,0 +1,28 @@
+# website/management/commands/build_image_variants.py
+
+from django.core.management.base import BaseCommand
+
+from website.images import generate_collection_variants
+from website.models import Collection
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates resized WebP/JPEG variants for collection images. New uploads "
+        "get theirs automatically; this backfills images uploaded before that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Rebuild variants even for collections that already have them.")
+
+    def handle(self, *args, **options):
+        collections = Collection.objects.exclude(image='')
+        if not options['all']:
+            collections = collections.filter(image_variants={})
+
+        count = 0
+        for collection_id in collections.values_list('id', flat=True):
+            generate_collection_variants(collection_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Built image variants for {count} collection(s)."))
@@ -0,0 +1,26 @@
+# website/management/commands/build_recommendations.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the 'frequently bought together' table from order items "
+        "(live and archived). Meant to run on a schedule, e.g. nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10,
+                            help="How many related products to keep per product.")
+        parser.add_argument('--orders-per-chunk', type=int, default=20000,
+                            help="Orders read into memory at a time.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = build_recommendations(k=options['top'], orders_per_chunk=options['orders_per_chunk'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} recommendation(s) in {elapsed:.1f}s."))
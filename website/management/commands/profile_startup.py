@@ -0,0 +1,98 @@
+# website/management/commands/profile_startup.py
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter so nothing is imported yet, the same as a
+# worker the host has just spun up.
+CHILD_SCRIPT = r'''
+import json, os, sys, time
+marks = {}
+import django
+django.setup()
+marks['setup'] = time.time()
+
+from django.conf import settings
+from django.urls import get_resolver
+get_resolver().url_patterns
+marks['urls'] = time.time()
+
+from django.test import Client
+host = next((h for h in settings.ALLOWED_HOSTS if '*' not in h), 'testserver')
+response = Client(HTTP_HOST=host).get(sys.argv[1])
+marks['first_request'] = time.time()
+marks['status'] = response.status_code
+print(json.dumps(marks))
+'''
+
+
+class Command(BaseCommand):
+    help = "Reports per-module import time and time-to-first-request for a cold worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/collections/',
+                            help="URL to request once the app has loaded.")
+        parser.add_argument('--top', type=int, default=20,
+                            help="How many of the slowest modules to list.")
+        parser.add_argument('--depth', type=int, default=0,
+                            help="Also list modules imported this many levels down "
+                                 "(0: only the top-level imports; use a large number for every module).")
+
+    def handle(self, *args, **options):
+        start = time.time()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, options['path']],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if result.returncode != 0:
+            # Drop the importtime lines so the traceback is what's left
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise CommandError(
+                f"The profiled interpreter exited with status {result.returncode}:\n" + '\n'.join(errors)
+            )
+        marks = json.loads(result.stdout.strip().splitlines()[-1])
+
+        rows = self.parse_importtime(result.stderr, max_depth=options['depth'])
+        self.stdout.write("Slowest imports (cumulative includes submodules, self doesn't):")
+        self.stdout.write(f"{'cumul. ms':>9}  {'self ms':>8}  module")
+        for cumulative, own, depth, module in rows[:options['top']]:
+            self.stdout.write(f"{cumulative / 1000:>9.1f}  {own / 1000:>8.1f}  {'  ' * depth}{module}")
+
+        self.stdout.write("")
+        self.stdout.write(f"django.setup() done:      {(marks['setup'] - start) * 1000:8.1f} ms")
+        self.stdout.write(f"URLconf loaded:           {(marks['urls'] - start) * 1000:8.1f} ms")
+        self.stdout.write(
+            f"first request served:     {(marks['first_request'] - start) * 1000:8.1f} ms"
+            f"  ({options['path']} -> {marks['status']})"
+        )
+
+    def parse_importtime(self, output, max_depth=0):
+        """
+        Lines look like 'import time:   self [us] | cumulative | module', with
+        the module name indented two spaces per level of nesting. Returns
+        (cumulative, self, depth, module) for modules at most max_depth levels
+        down, slowest first. A nested module's time is also in its parents'
+        cumulative time.
+        """
+        rows = []
+        for line in output.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            try:
+                own, cumulative, module = line[len('import time:'):].split('|')
+                own, cumulative = int(own), int(cumulative)
+            except ValueError:
+                continue  # the header line
+            name = module.strip()
+            # One space after the '|', then two per level
+            depth = (len(module) - len(module.lstrip()) - 1) // 2
+            if depth > max_depth:
+                continue
+            rows.append((cumulative, own, depth, name))
+        return sorted(rows, reverse=True)
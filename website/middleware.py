@@ -0,0 +1,100 @@
+# website/middleware.py
+
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, we fall back to gzip
+    brotli = None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+    return gzip.compress(content, compresslevel=6, mtime=0)
+
+
+def choose_encoding(accept_encoding):
+    """
+    Picks the best encoding the client accepts: brotli if available, then
+    gzip. Returns None if neither is acceptable.
+    """
+    accepted = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class APICompressionMiddleware:
+    """
+    Compresses JSON responses from the API with brotli or gzip, depending on
+    the client's Accept-Encoding. WhiteNoise already does this for static
+    files; this covers the product and order listings, whose descriptions
+    make them large.
+
+    Only GET/HEAD responses of at least API_COMPRESSION_MIN_SIZE bytes are
+    compressed. Responses to POSTs (login tokens, payment secrets) are left
+    alone so secrets are never compressed next to request data (BREACH).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+        # Run natively in whichever mode the rest of the chain uses, so
+        # under ASGI there is no thread hop for every API request
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if (
+            not request.path.startswith('/api/')
+            or request.method not in ('GET', 'HEAD')
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < self.min_size
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        return response
@@ -1,7 +1,8 @@
 # website/models.py
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
 
 class Category(models.Model):
@@ -44,6 +45,11 @@ class Order(models.Model):
         ('delivered', 'Delivered'),       # Order received by customer
         ('cancelled', 'Cancelled'),       # Order cancelled
     ]
+    # Which statuses an order may move to from its current one
+    ALLOWED_TRANSITIONS = {
+        'processing': ['shipped', 'cancelled'],
+        'shipped': ['delivered'],
+    }
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='processing')
     stripe_id = models.CharField(max_length=255, blank=True, null=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -59,10 +65,48 @@ class Order(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            # Order history is always looked up per user, newest first
+            models.Index(fields=['user', '-created']),
+        ]
 
     def __str__(self):
         return f'Order {self.id}'
 
+    @classmethod
+    def bulk_transition(cls, order_ids, new_status, changed_by=None):
+        """
+        Moves every order in order_ids that is allowed to go to new_status with a
+        single UPDATE, and records the change in OrderStatusHistory.
+        Returns (updated_ids, skipped_ids).
+        """
+        from_statuses = [
+            status for status, targets in cls.ALLOWED_TRANSITIONS.items()
+            if new_status in targets
+        ]
+        order_ids = set(order_ids)
+
+        with transaction.atomic():
+            current = dict(
+                cls.objects.select_for_update()
+                .filter(pk__in=order_ids, status__in=from_statuses)
+                .values_list('id', 'status')
+            )
+            if current:
+                # update() skips auto_now, so 'updated' is set by hand
+                cls.objects.filter(pk__in=current).update(status=new_status, updated=timezone.now())
+                OrderStatusHistory.objects.bulk_create([
+                    OrderStatusHistory(
+                        order_id=order_id,
+                        from_status=from_status,
+                        to_status=new_status,
+                        changed_by=changed_by,
+                    )
+                    for order_id, from_status in current.items()
+                ])
+
+        return sorted(current), sorted(order_ids - current.keys())
+
 # Model for items within an Order
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
@@ -76,6 +120,106 @@ class OrderItem(models.Model):
     def get_cost(self):
         return self.price * self.quantity
 
+# Audit trail of order status changes
+class OrderStatusHistory(models.Model):
+    # No database constraint so the history survives an order being moved to
+    # ArchivedOrder (which keeps the same id) by the archive_orders command.
+    # Rows of orders that are really deleted are removed in signals.py.
+    order = models.ForeignKey(
+        Order, related_name='status_history', on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    from_status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('-changed_at',)
+        verbose_name_plural = 'order status history'
+
+    def __str__(self):
+        return f'Order {self.order_id}: {self.from_status} -> {self.to_status}'
+
+# Responses to POSTs sent with an Idempotency-Key header, so a client retrying
+# after a timeout gets the original response instead of a duplicate order.
+# Rows older than IDEMPOTENCY_KEY_TTL_HOURS are expired: the key can be used
+# again, and `manage.py clear_idempotency_keys` removes them.
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+# Delivered and cancelled orders older than a cutoff are moved here by
+# `manage.py archive_orders` to keep the Order and OrderItem tables small.
+# The fields mirror Order/OrderItem and the ids are kept, so archived orders
+# can be serialized exactly like live ones (see website/archive.py).
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    stripe_id = models.CharField(max_length=255, blank=True, null=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    first_name = models.CharField(max_length=50)
+    last_name = models.CharField(max_length=50)
+    email = models.EmailField()
+    address = models.CharField(max_length=250)
+    postal_code = models.CharField(max_length=20)
+    city = models.CharField(max_length=100)
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+    paid = models.BooleanField(default=False)
+    archived = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['user', '-created']),
+        ]
+
+    def __str__(self):
+        return f'Archived order {self.id}'
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='archived_order_items', on_delete=models.CASCADE)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return str(self.id)
+
+    def get_cost(self):
+        return self.price * self.quantity
+
+# "Frequently bought together": the top products co-purchased with each
+# product, rebuilt by `manage.py build_recommendations`.
+class ProductRecommendation(models.Model):
+    product = models.ForeignKey(Product, related_name='recommendations', on_delete=models.CASCADE)
+    recommended = models.ForeignKey(Product, related_name='recommended_for', on_delete=models.CASCADE)
+    score = models.PositiveIntegerField()  # number of orders containing both products
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ('product', 'rank')
+        constraints = [
+            # Also the index the related-products endpoint reads through
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} -> {self.recommended_id} ({self.score})'
+
 class Collection(models.Model):
     GENDER_CHOICES = [
         ('her', 'For Her'),
@@ -88,6 +232,8 @@ class Collection(models.Model):
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='collections/%Y/%m/%d', blank=True)
+    # Resized copies of image, filled in the background (see website/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     products = models.ManyToManyField(Product, related_name='collections', blank=True)
     is_active = models.BooleanField(default=True) # So you can hide/show collections
 
@@ -95,4 +241,22 @@ class Collection(models.Model):
         ordering = ('name',)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    def save(self, *args, **kwargs):
+        previous = None
+        if self.pk:
+            previous = Collection.objects.filter(pk=self.pk).values('image', 'image_variants').first()
+        super().save(*args, **kwargs)
+
+        if previous is not None and previous['image'] == (self.image.name or ''):
+            return
+
+        # New or replaced image: drop the old variants and build new ones once committed
+        stale = [name for sizes in (previous or {}).get('image_variants', {}).values() for name in sizes.values()]
+        if stale or self.image_variants:
+            self.image_variants = {}
+            Collection.objects.filter(pk=self.pk).update(image_variants={})
+        if self.image or stale:
+            from .images import queue_collection_variants
+            transaction.on_commit(lambda: queue_collection_variants(self.pk, stale))
\ No newline at end of file
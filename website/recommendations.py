@@ -0,0 +1,115 @@
+# website/recommendations.py
+#
+# Builds the "frequently bought together" table from order history.
+# NumPy/SciPy are only imported here, by the build job, never by the web app.
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import ArchivedOrderItem, OrderItem, Product, ProductRecommendation
+
+
+def _order_chunks(model, orders_per_chunk):
+    """
+    Yields (first_order_id, n_orders, rows) where rows is an (n, 2) array of
+    (order_id, product_id). Chunks are ranges of order ids, so an order is
+    never split between two chunks and only one chunk is in memory at a time.
+    """
+    import numpy as np
+
+    bounds = model.objects.aggregate(low=Min('order_id'), high=Max('order_id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, orders_per_chunk):
+        rows = list(
+            model.objects.filter(order_id__gte=start, order_id__lt=start + orders_per_chunk)
+            .values_list('order_id', 'product_id')
+        )
+        if rows:
+            yield start, orders_per_chunk, np.array(rows, dtype=np.int64)
+
+
+def co_purchase_matrix(product_ids, orders_per_chunk=20000):
+    """
+    Returns a sparse (products x products) matrix where [i, j] is the number
+    of orders (live and archived) containing both product_ids[i] and
+    product_ids[j]. product_ids must be sorted.
+
+    For each chunk of orders we build the binary order x product matrix X,
+    and X.T @ X counts the co-purchases within it. Memory is bounded by the
+    chunk size plus the number of distinct product pairs, not by the number
+    of order items.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    n_products = len(product_ids)
+    counts = sparse.csr_matrix((n_products, n_products), dtype=np.int64)
+
+    for model in (OrderItem, ArchivedOrderItem):
+        for start, n_orders, rows in _order_chunks(model, orders_per_chunk):
+            product_index = np.searchsorted(product_ids, rows[:, 1])
+            # Skip items of products added after product_ids was read
+            known = product_ids[np.minimum(product_index, n_products - 1)] == rows[:, 1]
+            rows, product_index = rows[known], product_index[known]
+            order_index = rows[:, 0] - start
+            orders = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.int64), (order_index, product_index)),
+                shape=(n_orders, n_products),
+            )
+            # The same product twice in one order still counts once
+            orders.data[:] = 1
+            counts = counts + (orders.T @ orders)
+
+    counts.setdiag(0)
+    counts.eliminate_zeros()
+    return counts.tocsr()
+
+
+def top_neighbours(counts, k):
+    """
+    Yields (row, [(column, count), ...]) with the k highest counts per row,
+    highest first. Ties go to the lower column (older product).
+    """
+    import numpy as np
+
+    for row in range(counts.shape[0]):
+        start, end = counts.indptr[row], counts.indptr[row + 1]
+        if start == end:
+            continue
+        columns = counts.indices[start:end]
+        values = counts.data[start:end]
+        order = np.lexsort((columns, -values))[:k]
+        yield row, list(zip(columns[order].tolist(), values[order].tolist()))
+
+
+def build_recommendations(k=10, orders_per_chunk=20000, batch_size=5000):
+    """
+    Recomputes the whole ProductRecommendation table. Returns the number of
+    rows written.
+    """
+    import numpy as np
+
+    product_ids = np.array(
+        Product.objects.order_by('id').values_list('id', flat=True), dtype=np.int64
+    )
+    if not len(product_ids):
+        return 0
+    counts = co_purchase_matrix(product_ids, orders_per_chunk)
+
+    recommendations = [
+        ProductRecommendation(
+            product_id=int(product_ids[row]),
+            recommended_id=int(product_ids[column]),
+            score=score,
+            rank=rank,
+        )
+        for row, neighbours in top_neighbours(counts, k)
+        for rank, (column, score) in enumerate(neighbours, start=1)
+    ]
+
+    # Swap the table contents in one transaction so readers never see it half built
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(recommendations, batch_size=batch_size)
+    return len(recommendations)
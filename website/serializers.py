@@ -10,8 +10,30 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
+class SparseFieldsMixin:
+    """
+    Lets GET requests ask for a subset of fields, e.g. ?fields=id,name,price.
+    Unknown names are ignored; if none of the names are valid every field is sent.
+    This also applies when the serializer is nested (collection detail),
+    because the fields are worked out once the request is in the context.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return fields
+
+        requested = request.GET.get('fields')
+        if not requested:
+            return fields
+
+        wanted = {name.strip() for name in requested.split(',')}
+        sparse = {name: field for name, field in fields.items() if name in wanted}
+        return sparse or fields
+
+
 # --- THIS IS THE CRITICAL FIX FOR ALL PRODUCT IMAGES ---
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # We add a new, read-only field that will contain the clean URL string.
     image_url = serializers.SerializerMethodField()
 
@@ -75,6 +97,12 @@ class OrderSerializer(serializers.ModelSerializer):
         return order
 
 
+# Input for the staff bulk status endpoint
+class OrderBulkStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=['shipped', 'delivered', 'cancelled'])
+
+
 # This serializer provides product details for VIEWING an order's history
 # It has also been updated to include the 'image_url'
 class OrderProductSerializer(serializers.ModelSerializer):
@@ -108,24 +136,49 @@ class OrderHistorySerializer(serializers.ModelSerializer):
         fields = ("id", "status", "created", "address", "city", "postal_code", "items")
 
 
+def collection_image_srcset(collection):
+    """
+    {"webp": "<url> 320w, <url> 640w, ...", "jpeg": "..."} ready for a
+    <source srcset> / <img srcset>. Empty until the variants have been built.
+    """
+    storage = Collection.image.field.storage
+    return {
+        fmt: ', '.join(
+            f'{storage.url(name)} {width}w'
+            for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+        )
+        for fmt, sizes in collection.image_variants.items()
+        if sizes
+    }
+
+
 # This serializer lists collections on the homepage, now with a clean image_url
 class CollectionSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    # Resized WebP/JPEG versions of the image, so clients don't download the full original
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Collection
-        fields = ['id', 'name', 'slug', 'description', 'image_url']
+        fields = ['id', 'name', 'slug', 'description', 'image_url', 'image_srcset']
 
     def get_image_url(self, obj):
         if obj.image and hasattr(obj.image, 'url'):
             return obj.image.url
         return None
 
+    def get_image_srcset(self, obj):
+        return collection_image_srcset(obj)
+
 
 class CollectionDetailSerializer(serializers.ModelSerializer):
     # Because this uses ProductSerializer, it will automatically get the new 'image_url'
     products = ProductSerializer(many=True, read_only=True)
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Collection
-        fields = ['id', 'name', 'slug', 'description', 'products']
\ No newline at end of file
+        fields = ['id', 'name', 'slug', 'description', 'image_srcset', 'products']
+
+    def get_image_srcset(self, obj):
+        return collection_image_srcset(obj)
@@ -0,0 +1,47 @@
+# website/signals.py
+
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ArchivedOrder, Category, Order, OrderStatusHistory, Product
+
+CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def get_catalog_version():
+    """
+    Token that changes whenever a product or category is saved or deleted.
+    Cached pages of the catalog include it in their cache key, so any edit
+    moves them onto fresh keys. With REDIS_URL set every worker shares it;
+    with the per-process locmem cache a worker only sees its own edits and
+    the others catch up when their fragments expire.
+    """
+    return cache.get_or_set(CATALOG_VERSION_KEY, lambda: str(time.time_ns()), None)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def bump_catalog_version(sender, **kwargs):
+    cache.set(CATALOG_VERSION_KEY, str(time.time_ns()), None)
+
+
+# OrderStatusHistory has no database constraint on its order (see the model),
+# so the database won't clean it up; do it here when an order is really
+# deleted, e.g. from the admin or with its user. History of an order that
+# archive_orders has just moved to ArchivedOrder belongs to the archived copy.
+
+@receiver(post_delete, sender=Order)
+def delete_order_history(sender, instance, **kwargs):
+    (
+        OrderStatusHistory.objects.filter(order_id=instance.pk)
+        .exclude(order_id__in=ArchivedOrder.objects.filter(pk=instance.pk).values('pk'))
+        .delete()
+    )
+
+
+@receiver(post_delete, sender=ArchivedOrder)
+def delete_archived_order_history(sender, instance, **kwargs):
+    OrderStatusHistory.objects.filter(order_id=instance.pk).delete()
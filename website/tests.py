@@ -1,3 +1,820 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import random
+import subprocess
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.paginator import Paginator
+from django.http import HttpResponse
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .archive import archive_batch, load_orders, order_history
+from .images import generate_collection_variants, render_variants
+from .management.commands.profile_startup import Command as ProfileStartupCommand
+from .recommendations import build_recommendations, co_purchase_matrix, top_neighbours
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Category, Collection, IdempotencyKey, Order, OrderItem,
+    OrderStatusHistory, Product, ProductRecommendation,
+)
+from . import async_views, throttling
+from .middleware import APICompressionMiddleware
+from .renderers import FastJSONRenderer
+from .serializers import ProductSerializer
+from .throttling import LocalBuckets, TokenBucketThrottle, take_token
+
+
+def make_order_fixtures():
+    user = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+    category = Category.objects.create(name='Shirts', slug='shirts')
+    product = Product.objects.create(category=category, name='Tee', slug='tee', price='20.00')
+    payload = {
+        'address': '1 Moi Avenue',
+        'postal_code': '00100',
+        'city': 'Nairobi',
+        'items': [{'product': product.id, 'quantity': 2}],
+    }
+    return user, product, payload
+
+
+class OrderIdempotencyTests(TestCase):
+    def setUp(self):
+        self.user, self.product, self.payload = make_order_fixtures()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, payload, key=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post('/api/orders/create/', payload, format='json', headers=headers)
+
+    def test_retry_with_same_key_returns_original_response(self):
+        first = self.post(self.payload, key='abc')
+        second = self.post(self.payload, key='abc')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 1)
+
+    def test_same_key_with_different_request_is_rejected(self):
+        self.post(self.payload, key='abc')
+        response = self.post({**self.payload, 'city': 'Mombasa'}, key='abc')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.post(self.payload, key='abc')
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        self.client.force_authenticate(other)
+        response = self.post(self.payload, key='abc')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_request_is_not_stored(self):
+        response = self.post({**self.payload, 'items': [{'product': 999, 'quantity': 1}]}, key='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post(self.payload, key='abc')
+        self.assertEqual(response.status_code, 201)
+
+    def test_expired_key_is_treated_as_new(self):
+        self.post(self.payload, key='abc')
+        IdempotencyKey.objects.update(created=timezone.now() - timedelta(hours=25))
+
+        response = self.post({**self.payload, 'city': 'Mombasa'}, key='abc')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.get().response_body['id'], response.json()['id'])
+
+        # The new row replays as usual
+        self.assertEqual(self.post({**self.payload, 'city': 'Mombasa'}, key='abc')['Idempotent-Replayed'], 'true')
+
+    def test_without_key_every_request_creates_an_order(self):
+        self.post(self.payload)
+        self.post(self.payload)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrderIdempotencyConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        # Needs a database where a blocked INSERT waits for the other transaction
+        # (PostgreSQL, or file-backed SQLite); in-memory SQLite raises "table is locked" instead.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("concurrent writes need PostgreSQL or file-backed SQLite")
+
+    def test_simultaneous_duplicates_create_one_order(self):
+        user, product, payload = make_order_fixtures()
+        token = Token.objects.create(user=user)
+        attempts = 5
+        barrier = threading.Barrier(attempts)
+        responses = []
+
+        def submit():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            barrier.wait()
+            try:
+                responses.append(client.post(
+                    '/api/orders/create/', payload, format='json',
+                    headers={'Idempotency-Key': 'same-key'},
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual([r.status_code for r in responses], [201] * attempts)
+        self.assertEqual(len({r.json()['id'] for r in responses}), 1)
+
+
+class TokenBucketTests(TestCase):
+    def test_full_bucket_allows_burst_then_refuses(self):
+        state = None
+        results = []
+        for _ in range(4):
+            allowed, state = take_token(state, now=100.0, capacity=3, refill_per_second=0.1)
+            results.append(allowed)
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_tokens_refill_over_time_up_to_capacity(self):
+        allowed, state = take_token((0.0, 100.0), now=105.0, capacity=3, refill_per_second=0.1)
+        self.assertFalse(allowed)
+        allowed, state = take_token(state, now=110.0, capacity=3, refill_per_second=0.1)
+        self.assertTrue(allowed)
+        self.assertAlmostEqual(state[0], 0.0)
+
+        allowed, state = take_token((0.0, 0.0), now=1000.0, capacity=3, refill_per_second=0.1)
+        self.assertAlmostEqual(state[0], 2.0)
+
+    def test_local_buckets_are_bounded(self):
+        buckets = LocalBuckets(max_entries=3)
+        for i in range(10):
+            buckets.take(f'ip_{i}', 0.0, 5, 1.0)
+        self.assertEqual(list(buckets.buckets), ['ip_7', 'ip_8', 'ip_9'])
+
+
+@mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'login': '3/min', 'register': '3/min', 'payment': '3/min'})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def login(self, **extra):
+        return APIClient().post('/api/login/', {'username': 'nobody', 'password': 'wrong'}, **extra)
+
+    def test_returns_429_with_retry_after(self):
+        statuses = [self.login(REMOTE_ADDR='10.0.0.1').status_code for _ in range(4)]
+        self.assertEqual(statuses, [400, 400, 400, 429])
+
+        response = self.login(REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        # One token comes back every 20 seconds at 3/min
+        self.assertIn(int(response['Retry-After']), range(1, 21))
+
+    def test_spoofed_forwarded_for_does_not_reset_the_limit(self):
+        # The proxy appends the real client address after whatever the client sent
+        statuses = [
+            self.login(HTTP_X_FORWARDED_FOR=f'1.2.3.{i}, 203.0.113.7', REMOTE_ADDR='10.0.0.2').status_code
+            for i in range(5)
+        ]
+        self.assertEqual(statuses, [400, 400, 400, 429, 429])
+
+    def test_clients_have_separate_buckets(self):
+        for _ in range(3):
+            self.login(HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='203.0.113.7').status_code, 429)
+        self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='203.0.113.8').status_code, 400)
+
+    def test_falls_back_to_local_buckets_when_cache_is_down(self):
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError):
+            statuses = [self.login(REMOTE_ADDR='10.0.0.3').status_code for _ in range(4)]
+        self.assertEqual(statuses, [400, 400, 400, 429])
+        self.assertIn('throttle_bucket_login_ip_10.0.0.3', throttling._local_buckets.buckets)
+        self.assertIsNone(cache.get('throttle_bucket_login_ip_10.0.0.3'))
+
+
+class ProductListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name='Shirts', slug='shirts')
+        self.hats = Category.objects.create(name='Hats', slug='hats')
+        for i in range(15):
+            Product.objects.create(category=self.shirts, name=f'Shirt {i:02}', slug=f'shirt-{i}', price='20.00')
+        for i in range(3):
+            Product.objects.create(category=self.hats, name=f'Hat {i}', slug=f'hat-{i}', price='10.00')
+        Product.objects.create(category=self.hats, name='Hidden hat', slug='hidden-hat', price='10.00', available=False)
+
+    def test_category_page_only_lists_that_category(self):
+        response = self.client.get('/shop/hats/')
+        self.assertEqual(response.context['category'], self.hats)
+        self.assertEqual([p.name for p in response.context['page_obj']], ['Hat 0', 'Hat 1', 'Hat 2'])
+        self.assertNotContains(response, 'Shirt 00')
+        self.assertNotContains(response, 'Hidden hat')
+        self.assertNotContains(response, 'class="pagination"')
+
+    def test_unknown_category_is_404(self):
+        self.assertEqual(self.client.get('/shop/socks/').status_code, 404)
+
+    def test_pagination_links(self):
+        first = self.client.get('/shop/')
+        self.assertEqual(len(first.context['page_obj']), 12)
+        self.assertContains(first, 'Page 1 of 2')
+        self.assertContains(first, 'href="?page=2"')
+        self.assertNotContains(first, 'Previous')
+
+        second = self.client.get('/shop/', {'page': 2})
+        self.assertEqual(len(second.context['page_obj']), 6)
+        self.assertContains(second, 'Page 2 of 2')
+        self.assertContains(second, 'href="?page=1"')
+        self.assertNotContains(second, 'Next')
+
+    def test_products_and_their_categories_load_in_one_query(self):
+        # On a cache miss: the page count, the category nav and the products
+        # with their categories joined in, however many products are shown
+        with self.assertNumQueries(3):
+            response = self.client.get('/shop/')
+        self.assertContains(response, '<p>Hats</p>', count=3)
+        self.assertContains(response, '<p>Shirts</p>', count=9)
+
+
+class ProductListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name='Shirts', slug='shirts')
+        Product.objects.create(category=self.shirts, name='Tee', slug='tee', price='20.00')
+
+    def test_new_category_shows_up_on_cached_page(self):
+        self.client.get('/shop/')
+        Category.objects.create(name='Hats', slug='hats')
+        self.assertContains(self.client.get('/shop/'), 'Hats')
+
+    def test_renamed_category_shows_up_on_cached_page(self):
+        self.client.get('/shop/')
+        self.shirts.name = 'Tops'
+        self.shirts.save()
+        self.assertContains(self.client.get('/shop/'), 'Tops')
+
+    def test_out_of_range_pages_share_the_last_page_fragment(self):
+        self.client.get('/shop/')
+        with CaptureQueriesContext(connection) as queries:
+            for page in ('2', '999', 'abc'):
+                self.assertContains(self.client.get('/shop/', {'page': page}), 'Tee')
+        # Only the categories lookups and page counts; the products come from the cache
+        self.assertFalse([q for q in queries if 'website_product"."name' in q['sql']])
+
+
+def make_order(user, status='processing'):
+    return Order.objects.create(
+        user=user, status=status, first_name='A', last_name='B', email='a@example.com',
+        address='1 Moi Avenue', postal_code='00100', city='Nairobi',
+    )
+
+
+class OrderStatusTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+
+    def test_bulk_transition_updates_allowed_and_skips_the_rest(self):
+        processing = make_order(self.user)
+        shipped = make_order(self.user, status='shipped')
+        delivered = make_order(self.user, status='delivered')
+
+        updated, skipped = Order.bulk_transition(
+            [processing.pk, shipped.pk, delivered.pk, 999], 'delivered', changed_by=self.staff
+        )
+
+        self.assertEqual(updated, [shipped.pk])
+        self.assertEqual(skipped, sorted([processing.pk, delivered.pk, 999]))
+        self.assertEqual(Order.objects.get(pk=shipped.pk).status, 'delivered')
+        self.assertEqual(Order.objects.get(pk=processing.pk).status, 'processing')
+
+    def test_bulk_transition_records_history(self):
+        orders = [make_order(self.user), make_order(self.user)]
+        Order.bulk_transition([o.pk for o in orders], 'shipped', changed_by=self.staff)
+
+        history = OrderStatusHistory.objects.order_by('order_id')
+        self.assertEqual(
+            list(history.values_list('order_id', 'from_status', 'to_status', 'changed_by')),
+            [(o.pk, 'processing', 'shipped', self.staff.pk) for o in orders],
+        )
+
+    def test_cancel_goes_through_transition(self):
+        order = make_order(self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post(f'/api/orders/{order.pk}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'cancelled')
+        self.assertEqual(OrderStatusHistory.objects.get().to_status, 'cancelled')
+
+    def test_cancel_refused_when_order_shipped_meanwhile(self):
+        order = make_order(self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # The order is shipped after the view read it but before it cancels
+        def ship_first(order_ids, new_status, changed_by=None):
+            Order.objects.filter(pk=order.pk).update(status='shipped')
+            return transition(order_ids, new_status, changed_by)
+
+        transition = Order.bulk_transition
+        with mock.patch.object(Order, 'bulk_transition', side_effect=ship_first):
+            response = client.post(f'/api/orders/{order.pk}/cancel/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'shipped')
+        self.assertFalse(OrderStatusHistory.objects.exists())
+
+    def test_admin_change_form_cannot_edit_status(self):
+        order = make_order(self.user)
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.client.force_login(self.staff)
+
+        response = self.client.get(f'/admin/website/order/{order.pk}/change/')
+        self.assertNotContains(response, 'name="status"')
+
+
+class APIEncodingTests(TestCase):
+    def test_renderer_handles_non_string_keys(self):
+        rendered = FastJSONRenderer().render({'ids': {0: ['A valid integer is required.']}})
+        self.assertEqual(rendered, b'{"ids":{"0":["A valid integer is required."]}}')
+
+    def test_list_field_validation_error_is_rendered(self):
+        staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+
+        response = client.post('/api/orders/bulk-status/', {'ids': ['x', 1], 'status': 'shipped'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('0', response.json()['ids'])
+
+    def test_compression_middleware_works_sync_and_async(self):
+        body = b'{"name": "Tee"}' * 200
+
+        def get_response(request):
+            return HttpResponse(body, content_type='application/json')
+
+        async def aget_response(request):
+            return get_response(request)
+
+        request = RequestFactory().get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        sync_response = APICompressionMiddleware(get_response)(request)
+        async_middleware = APICompressionMiddleware(aget_response)
+        self.assertTrue(asyncio.iscoroutinefunction(async_middleware))
+        async_response = asyncio.run(async_middleware(request))
+
+        for response in (sync_response, async_response):
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(response.content), body)
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        self.user, self.product, _ = make_order_fixtures()
+        self.staff = User.objects.create_superuser('staff', 'staff@example.com', 'pw')
+
+    def make_orders(self, statuses):
+        orders = []
+        for status in statuses:
+            order = make_order(self.user, status=status)
+            OrderItem.objects.create(order=order, product=self.product, price='20.00', quantity=1)
+            orders.append(order)
+        return orders
+
+    def test_archive_batch_moves_finished_orders_with_items(self):
+        delivered, cancelled, processing = self.make_orders(['delivered', 'cancelled', 'processing'])
+        OrderStatusHistory.objects.create(order=delivered, from_status='shipped', to_status='delivered')
+
+        moved = archive_batch(timezone.now(), batch_size=1)
+        self.assertEqual(moved, 1)
+        moved = archive_batch(timezone.now(), batch_size=10)
+        self.assertEqual(moved, 1)
+        self.assertEqual(archive_batch(timezone.now(), batch_size=10), 0)
+
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [processing.pk])
+        self.assertEqual(OrderItem.objects.get().order_id, processing.pk)
+        archived = ArchivedOrder.objects.get(pk=delivered.pk)
+        self.assertEqual((archived.status, archived.created), ('delivered', delivered.created))
+        self.assertEqual(
+            sorted(ArchivedOrderItem.objects.values_list('order_id', flat=True)),
+            [delivered.pk, cancelled.pk],
+        )
+        # The history stays with the archived order
+        self.assertEqual(OrderStatusHistory.objects.get().order_id, delivered.pk)
+
+    def test_archive_batch_respects_cutoff(self):
+        self.make_orders(['delivered'])
+        self.assertEqual(archive_batch(timezone.now() - timedelta(days=1), batch_size=10), 0)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_order_history_paginates_across_live_and_archive(self):
+        orders = self.make_orders(['delivered', 'processing', 'cancelled', 'shipped', 'delivered'])
+        archive_batch(timezone.now(), batch_size=10)
+        newest_first = [order.pk for order in reversed(orders)]
+
+        paginator = Paginator(order_history(self.user), 2)
+        self.assertEqual(paginator.count, 5)
+        pages = [load_orders(paginator.page(n).object_list) for n in paginator.page_range]
+
+        self.assertEqual([[o.pk for o in page] for page in pages], [newest_first[0:2], newest_first[2:4], newest_first[4:]])
+        self.assertEqual(
+            [type(o) for page in pages for o in page],
+            [ArchivedOrder, Order, ArchivedOrder, Order, ArchivedOrder],
+        )
+        self.assertEqual([o.items.all()[0].product for o in pages[0]], [self.product, self.product])
+
+    def test_deleting_an_order_deletes_its_history(self):
+        order, kept = self.make_orders(['processing', 'processing'])
+        Order.bulk_transition([order.pk, kept.pk], 'shipped')
+
+        order.delete()
+        self.assertEqual(list(OrderStatusHistory.objects.values_list('order_id', flat=True)), [kept.pk])
+
+    def test_deleting_a_user_deletes_history_of_live_and_archived_orders(self):
+        delivered, processing = self.make_orders(['delivered', 'processing'])
+        OrderStatusHistory.objects.create(order=delivered, from_status='shipped', to_status='delivered')
+        OrderStatusHistory.objects.create(order=processing, from_status='processing', to_status='shipped')
+        archive_batch(timezone.now(), batch_size=10)
+
+        self.user.delete()
+        self.assertFalse(OrderStatusHistory.objects.exists())
+
+    def test_archived_order_admin_shows_history(self):
+        order, = self.make_orders(['shipped'])
+        Order.bulk_transition([order.pk], 'delivered', changed_by=self.staff)
+        archive_batch(timezone.now(), batch_size=10)
+        self.client.force_login(self.staff)
+
+        response = self.client.get(f'/admin/website/archivedorder/{order.pk}/change/')
+        self.assertContains(response, 'Shipped &rarr; Delivered (staff)')
+
+
+def open_variants(original):
+    from PIL import Image
+
+    return {(fmt, width): Image.open(BytesIO(content)) for fmt, width, content in render_variants(original)}
+
+
+class ImageVariantTests(TestCase):
+    def test_renders_each_width_in_each_format(self):
+        from PIL import Image
+
+        variants = open_variants(Image.new('RGB', (2000, 1000), 'red'))
+
+        self.assertEqual(sorted(variants), [
+            (fmt, width) for fmt in ('jpeg', 'webp') for width in (320, 640, 1024, 1600)
+        ])
+        self.assertEqual(variants[('webp', 640)].format, 'WEBP')
+        self.assertEqual(variants[('jpeg', 640)].format, 'JPEG')
+        self.assertEqual(variants[('jpeg', 640)].size, (640, 320))
+
+    def test_never_upscales(self):
+        from PIL import Image
+
+        variants = open_variants(Image.new('RGB', (500, 250), 'red'))
+
+        self.assertEqual(sorted({width for _, width in variants}), [320, 500])
+        self.assertEqual(variants[('jpeg', 500)].size, (500, 250))
+
+    def test_jpeg_flattens_transparency_onto_white(self):
+        from PIL import Image
+
+        variants = open_variants(Image.new('RGBA', (400, 200), (255, 0, 0, 0)))
+
+        self.assertEqual(variants[('jpeg', 400)].mode, 'RGB')
+        self.assertTrue(all(channel > 245 for channel in variants[('jpeg', 400)].getpixel((10, 10))))
+        self.assertEqual(variants[('webp', 400)].mode, 'RGBA')
+
+
+@mock.patch('website.images.queue_collection_variants')
+class CollectionImageTests(TestCase):
+    def test_new_image_queues_variants_after_commit(self, queue):
+        with self.captureOnCommitCallbacks(execute=True):
+            collection = Collection.objects.create(name='Summer', slug='summer', image='collections/a.jpg')
+            queue.assert_not_called()
+        queue.assert_called_once_with(collection.pk, [])
+
+    def test_unchanged_image_does_not_queue(self, queue):
+        collection = Collection.objects.create(name='Summer', slug='summer', image='collections/a.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            collection.name = 'Summer sale'
+            collection.save()
+        queue.assert_not_called()
+
+    def test_replaced_image_clears_and_queues_stale_variants(self, queue):
+        collection = Collection.objects.create(name='Summer', slug='summer', image='collections/a.jpg')
+        variants = {'webp': {'320': 'collections/a_320w.webp'}, 'jpeg': {'320': 'collections/a_320w.jpg'}}
+        Collection.objects.filter(pk=collection.pk).update(image_variants=variants)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            collection.image = 'collections/b.jpg'
+            collection.save()
+
+        queue.assert_called_once_with(collection.pk, ['collections/a_320w.webp', 'collections/a_320w.jpg'])
+        self.assertEqual(Collection.objects.get(pk=collection.pk).image_variants, {})
+
+    def test_generate_replaces_stale_files_and_records_new_ones(self, queue):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            storage = Collection.image.field.storage
+            stale = storage.save('collections/old_320w.jpg', ContentFile(b'old'))
+            buffer = BytesIO()
+            Image.new('RGB', (800, 400), 'blue').save(buffer, 'PNG')
+            image = storage.save('collections/new.png', ContentFile(buffer.getvalue()))
+            collection = Collection.objects.create(name='Summer', slug='summer', image=image)
+
+            generate_collection_variants(collection.pk, [stale])
+
+            self.assertFalse(storage.exists(stale))
+            variants = Collection.objects.get(pk=collection.pk).image_variants
+            self.assertEqual(variants['webp'], {
+                '320': 'collections/new_320w.webp', '640': 'collections/new_640w.webp', '800': 'collections/new_800w.webp',
+            })
+            self.assertTrue(all(storage.exists(name) for name in variants['jpeg'].values()))
+
+
+# The read endpoints as they are routed under ASGI (ASGI_MODE), for comparing
+# them with the DRF views the default urlconf uses.
+urlpatterns = [
+    path('api/products/', async_views.AsyncProductAPIView.as_view()),
+    path('api/collections/', async_views.AsyncCollectionListView.as_view()),
+    path('api/collections/<slug:slug>/', async_views.AsyncCollectionDetailView.as_view()),
+    path('api/orders/', async_views.AsyncOrderListAPIView.as_view()),
+]
+
+
+class AsyncViewsMatchDRFTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        shirts = Category.objects.create(name='Shirts', slug='shirts')
+        hats = Category.objects.create(name='Hats', slug='hats')
+        cls.shirts = shirts
+        products = [
+            Product.objects.create(
+                category=shirts if i % 2 else hats, name=f'Product {i}', slug=f'product-{i}', price=f'{i}.50'
+            )
+            for i in range(20)
+        ]
+        collection = Collection.objects.create(name='Summer', slug='summer', gender_category='her')
+        collection.products.set(products[:5])
+        Collection.objects.create(name='Winter', slug='winter', gender_category='him')
+
+        cls.user = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        cls.token = Token.objects.create(user=cls.user).key
+        inactive = User.objects.create_user('gone', 'gone@example.com', 'pw', is_active=False)
+        cls.inactive_token = Token.objects.create(user=inactive).key
+        for i, status in enumerate(['delivered', 'processing', 'cancelled'] * 4):
+            order = make_order(cls.user, status=status)
+            OrderItem.objects.create(order=order, product=products[i], price='1.00', quantity=2)
+        archive_batch(timezone.now(), batch_size=100)
+
+    def assertSameResponse(self, url, **headers):
+        expected = self.client.get(url, headers=headers)
+        with override_settings(ROOT_URLCONF='website.tests'):
+            actual = async_to_sync(self.async_client.get)(url, headers=headers)
+
+        self.assertEqual(actual.status_code, expected.status_code, url)
+        self.assertEqual(actual.json(), expected.json(), url)
+        self.assertEqual(actual.get('WWW-Authenticate'), expected.get('WWW-Authenticate'), url)
+        return actual
+
+    def test_products(self):
+        for query in ['', '?page=', '?page=2', '?page=last', '?page=3', '?page=99', '?page=0', '?page=abc',
+                      f'?category={self.shirts.pk}', f'?category={self.shirts.pk}&page=last',
+                      '?category=999', '?category=abc', '?fields=id,name', '?fields=id,nope&page=2', '?fields=nope']:
+            self.assertSameResponse(f'/api/products/{query}')
+
+    def test_collections(self):
+        for url in ['/api/collections/', '/api/collections/?gender_category=her',
+                    '/api/collections/?gender_category=zz', '/api/collections/summer/',
+                    '/api/collections/summer/?fields=id,price', '/api/collections/nope/']:
+            self.assertSameResponse(url)
+
+    def test_order_history_includes_archived_orders(self):
+        auth = f'Token {self.token}'
+        first = self.assertSameResponse('/api/orders/', Authorization=auth)
+        self.assertEqual(first.json()['count'], 12)
+        statuses = {order['status'] for page in ['', '?page=', '?page=2', '?page=last']
+                    for order in self.assertSameResponse(f'/api/orders/{page}', Authorization=auth).json()['results']}
+        self.assertEqual(statuses, {'delivered', 'processing', 'cancelled'})
+        self.assertSameResponse('/api/orders/?page=3', Authorization=auth)
+
+    def test_order_history_authentication(self):
+        for auth in [None, 'Token', 'Token a b', 'Token wrong', 'Token caf\xe9', f'Token {self.inactive_token}', f'Bearer {self.token}']:
+            headers = {'Authorization': auth} if auth else {}
+            response = self.assertSameResponse('/api/orders/', **headers)
+            self.assertEqual(response.status_code, 401, auth)
+
+    def test_static_path_outside_static_root_is_404(self):
+        from ecommerce_project.asgi import application
+
+        request = AsyncRequestFactory().get('/static/../settings.py')
+        response = async_to_sync(application.get_response_async)(request)
+        self.assertEqual(response.status_code, 404)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.products = [
+            Product.objects.create(category=category, name=f'Product {i}', slug=f'product-{i}', price='1.00')
+            for i in range(8)
+        ]
+
+    def order(self, *products, status='processing'):
+        order = make_order(self.user, status=status)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price='1.00', quantity=1)
+        return order
+
+    def brute_force_counts(self):
+        baskets = {}
+        for model in (OrderItem, ArchivedOrderItem):
+            for order_id, product_id in model.objects.values_list('order_id', 'product_id'):
+                baskets.setdefault(order_id, set()).add(product_id)
+        counts = {}
+        for basket in baskets.values():
+            for a in basket:
+                for b in basket - {a}:
+                    counts[a, b] = counts.get((a, b), 0) + 1
+        return counts
+
+    def test_matches_brute_force_across_chunks_and_archive(self):
+        import numpy as np
+
+        rng = random.Random(42)
+        for i in range(40):
+            basket = rng.choices(self.products, k=rng.randint(1, 5))  # may repeat a product
+            self.order(*basket, status='delivered' if i % 3 == 0 else 'processing')
+        self.assertEqual(archive_batch(timezone.now(), batch_size=100), 14)
+
+        product_ids = np.array(sorted(p.pk for p in self.products), dtype=np.int64)
+        expected = self.brute_force_counts()
+        for orders_per_chunk in (1, 7, 20000):
+            counts = co_purchase_matrix(product_ids, orders_per_chunk).todok()
+            actual = {
+                (int(product_ids[i]), int(product_ids[j])): int(count) for (i, j), count in counts.items()
+            }
+            self.assertEqual(actual, expected, orders_per_chunk)
+
+    def test_same_product_twice_in_an_order_counts_once(self):
+        import numpy as np
+
+        a, b = self.products[:2]
+        self.order(a, a, b)
+        self.order(a, b, b)
+
+        counts = co_purchase_matrix(np.array([a.pk, b.pk], dtype=np.int64)).toarray()
+        self.assertEqual(counts.tolist(), [[0, 2], [2, 0]])
+
+    def test_products_missing_from_the_snapshot_are_skipped(self):
+        import numpy as np
+
+        # Products created after build_recommendations read the product list,
+        # both at the end and in the middle of the id range
+        a, new, b, newest = self.products[:4]
+        self.order(a, new, b, newest)
+
+        counts = co_purchase_matrix(np.array([a.pk, b.pk], dtype=np.int64)).toarray()
+        self.assertEqual(counts.tolist(), [[0, 1], [1, 0]])
+
+    def test_top_neighbours_orders_by_count_then_column(self):
+        from scipy import sparse
+
+        counts = sparse.csr_matrix([
+            [0, 3, 5, 3, 1],
+            [0, 0, 0, 0, 0],
+            [2, 2, 0, 0, 0],
+        ])
+        self.assertEqual(list(top_neighbours(counts, 3)), [
+            (0, [(2, 5), (1, 3), (3, 3)]),
+            (2, [(0, 2), (1, 2)]),
+        ])
+
+    def test_build_writes_ranked_rows_and_endpoint_serves_them(self):
+        a, b, c, d = self.products[:4]
+        self.order(a, b)
+        self.order(a, b, c)
+        self.order(a, c)
+        self.order(a, b, d)
+        d.available = False
+        d.save()
+        ProductRecommendation.objects.create(product=c, recommended=d, score=99, rank=1)
+
+        self.assertEqual(build_recommendations(k=2), 8)
+        self.assertEqual(
+            list(ProductRecommendation.objects.filter(product=a).values_list('recommended', 'score', 'rank')),
+            [(b.pk, 3, 1), (c.pk, 2, 2)],
+        )
+
+        client = APIClient()
+        self.assertEqual([p['id'] for p in client.get(f'/api/products/{a.pk}/related/').json()], [b.pk, c.pk])
+        # Unavailable products are left out
+        self.assertEqual([p['id'] for p in client.get(f'/api/products/{b.pk}/related/').json()], [a.pk, c.pk])
+        self.assertEqual([p['id'] for p in client.get(f'/api/products/{d.pk}/related/').json()], [a.pk, b.pk])
+        self.assertEqual(client.get(f'/api/products/{self.products[7].pk}/related/').json(), [])
+        self.assertEqual(client.get('/api/products/999/related/').status_code, 404)
+
+
+IMPORTTIME_SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:        50 |        170 | io
+import time:       300 |        300 |     rest_framework.fields
+import time:       200 |        500 |   rest_framework.serializers
+import time:       100 |        600 | website.views
+Traceback lines and other output are ignored
+"""
+
+
+class ProfileStartupTests(TestCase):
+    def test_parse_importtime_keeps_top_level_by_default(self):
+        rows = ProfileStartupCommand().parse_importtime(IMPORTTIME_SAMPLE)
+        self.assertEqual(rows, [(600, 100, 0, 'website.views'), (170, 50, 0, 'io')])
+
+    def test_parse_importtime_lists_nested_modules_up_to_depth(self):
+        rows = ProfileStartupCommand().parse_importtime(IMPORTTIME_SAMPLE, max_depth=1)
+        self.assertEqual([row[2:] for row in rows], [
+            (0, 'website.views'), (1, 'rest_framework.serializers'), (0, 'io'), (1, '_io'),
+        ])
+        rows = ProfileStartupCommand().parse_importtime(IMPORTTIME_SAMPLE, max_depth=99)
+        self.assertIn((300, 300, 2, 'rest_framework.fields'), rows)
+
+    def test_failing_child_raises_command_error(self):
+        failed = subprocess.CompletedProcess(
+            args=[], returncode=1, stdout='',
+            stderr=IMPORTTIME_SAMPLE + 'ImproperlyConfigured: The SECRET_KEY setting must not be empty.\n',
+        )
+        with mock.patch('subprocess.run', return_value=failed):
+            with self.assertRaisesMessage(CommandError, 'ImproperlyConfigured: The SECRET_KEY'):
+                call_command('profile_startup')
+
+
+# ProductSerializer's output; 'image' is write-only
+ALL_PRODUCT_FIELDS = {'id', 'name', 'price', 'description', 'image_url'}
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.product = Product.objects.create(category=category, name='Tee', slug='tee', price='20.00')
+        collection = Collection.objects.create(name='Summer', slug='summer')
+        collection.products.add(self.product)
+        self.client = APIClient()
+
+    def test_list_and_detail(self):
+        response = self.client.get('/api/products/', {'fields': 'id,price'})
+        self.assertEqual(response.json()['results'], [{'id': self.product.pk, 'price': '20.00'}])
+
+        response = self.client.get(f'/api/products/{self.product.pk}/', {'fields': ' name , id'})
+        self.assertEqual(response.json(), {'id': self.product.pk, 'name': 'Tee'})
+
+    def test_nested_in_collection_detail(self):
+        data = self.client.get('/api/collections/summer/', {'fields': 'id,name'}).json()
+        self.assertEqual(data['products'], [{'id': self.product.pk, 'name': 'Tee'}])
+        # The collection itself doesn't take ?fields=
+        self.assertIn('slug', data)
+
+    def test_unknown_names_are_ignored(self):
+        response = self.client.get(f'/api/products/{self.product.pk}/', {'fields': 'id,secret'})
+        self.assertEqual(response.json(), {'id': self.product.pk})
+
+    def test_only_unknown_names_sends_every_field(self):
+        response = self.client.get(f'/api/products/{self.product.pk}/', {'fields': 'secret'})
+        self.assertEqual(set(response.json()), ALL_PRODUCT_FIELDS)
+
+    def test_ignored_on_other_methods(self):
+        request = Request(APIRequestFactory().post('/api/products/?fields=id'))
+        serializer = ProductSerializer(self.product, context={'request': request})
+        self.assertEqual(set(serializer.data), ALL_PRODUCT_FIELDS)
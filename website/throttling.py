@@ -0,0 +1,149 @@
+# website/throttling.py
+
+import threading
+from collections import OrderedDict
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def take_token(state, now, capacity, refill_per_second):
+    """
+    The token-bucket maths. state is (tokens, last_refill_time) or None for a
+    full bucket. Returns (allowed, new_state).
+    """
+    tokens, last = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - last) * refill_per_second)
+    if tokens < 1:
+        return False, (tokens, now)
+    return True, (tokens - 1, now)
+
+
+# Runs take_token() inside Redis so concurrent requests from every worker
+# see each other's updates. Returns {allowed, tokens left}.
+REDIS_TAKE_TOKEN = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * refill)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+
+class LocalBuckets:
+    """
+    In-process bucket store, used when the shared cache cannot be reached
+    (each worker then throttles on its own, which is better than not at all).
+    Bounded: once full, the least recently used buckets are dropped, which
+    at worst hands a forgotten client a fresh bucket.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, now, capacity, refill_per_second):
+        with self.lock:
+            allowed, state = take_token(self.buckets.get(key), now, capacity, refill_per_second)
+            self.buckets[key] = state
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+        return allowed, state[0]
+
+
+_local_buckets = LocalBuckets()
+_cache_lock = threading.Lock()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token-bucket throttle keyed on scope (endpoint) + user or client IP.
+
+    The rate string from DEFAULT_THROTTLE_RATES ('5/min') gives the bucket
+    size and how long it takes to refill completely, so short bursts are
+    allowed while the long-run average stays at the configured rate.
+
+    With Redis the check-and-update is one Lua script, so it is atomic across
+    workers. With the locmem cache the buckets are per process anyway and a
+    lock makes the get/set atomic. Any other shared cache backend would only
+    be atomic within a process, letting a client burst by up to one extra
+    token per worker.
+    """
+    cache_format = 'throttle_bucket_%(scope)s_%(ident)s'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user_{request.user.pk}'
+        else:
+            # Honours REST_FRAMEWORK['NUM_PROXIES'], so a client can't dodge
+            # the limit by sending its own X-Forwarded-For header
+            ident = f'ip_{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        self.refill_per_second = self.num_requests / self.duration
+        try:
+            allowed, self.tokens = self._take_from_cache()
+        except Exception:
+            allowed, self.tokens = _local_buckets.take(
+                self.key, self.now, self.num_requests, self.refill_per_second
+            )
+        return allowed
+
+    def wait(self):
+        # Seconds until one whole token is back in the bucket
+        return max(0.0, (1 - self.tokens) / self.refill_per_second)
+
+    def _take_from_cache(self):
+        redis_client = self._redis_client()
+        if redis_client is not None:
+            allowed, tokens = redis_client.eval(
+                REDIS_TAKE_TOKEN, 1, self.cache.make_and_validate_key(self.key),
+                self.num_requests, self.refill_per_second, self.now, self.duration,
+            )
+            return bool(allowed), float(tokens)
+
+        with _cache_lock:
+            allowed, state = take_token(
+                self.cache.get(self.key), self.now, self.num_requests, self.refill_per_second
+            )
+            self.cache.set(self.key, state, self.duration)
+        return allowed, state[0]
+
+    def _redis_client(self):
+        # Django's built-in RedisCache exposes its redis-py client this way
+        client = getattr(self.cache, '_cache', None)
+        if client is None or not hasattr(client, 'get_client'):
+            return None
+        return client.get_client(self.key, write=True)
+
+
+class RegisterRateThrottle(TokenBucketThrottle):
+    scope = 'register'
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    scope = 'login'
+
+
+class PaymentRateThrottle(TokenBucketThrottle):
+    scope = 'payment'
@@ -1,48 +1,63 @@
 # website/views.py
 
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
+from django.core.paginator import Paginator
 from .models import Category, Product
+from .signals import get_catalog_version
 from django.utils import timezone
 from datetime import timedelta
 
+PRODUCTS_PER_PAGE = 12
+# How long a rendered product grid is kept. Edits normally invalidate it
+# straight away (see get_catalog_version); this bounds it otherwise.
+PRODUCT_LIST_CACHE_SECONDS = 600
+
 def product_list(request, category_slug=None):
-    # We start by getting all available products
-    products = Product.objects.filter(available=True)
+    category = None
+    if category_slug:
+        category = get_object_or_404(Category, slug=category_slug)
+
+    # We start by getting all available products, with their category in the same query
+    products = Product.objects.filter(available=True).select_related('category')
+    if category:
+        products = products.filter(category=category)
 
-    # We'll also get all categories to display them later if we want
-    categories = Category.objects.all()
+    # get_page() clamps bad or out-of-range numbers, so the cache key below
+    # uses the page actually shown. This costs a COUNT; the products
+    # themselves are only fetched when the fragment isn't cached.
+    page_obj = Paginator(products, PRODUCTS_PER_PAGE).get_page(request.GET.get('page'))
 
     # This context dictionary is what sends the data to the HTML template
     context = {
-        'categories': categories,
-        'products': products
+        'category': category,
+        'categories': Category.objects.all(),
+        'page_obj': page_obj,
+        'catalog_version': get_catalog_version(),
+        'cache_seconds': PRODUCT_LIST_CACHE_SECONDS,
     }
     return render(request, 'website/product_list.html', context)
   
-from rest_framework import generics
-from .models import Product, Category
-from .serializers import ProductSerializer
-from .serializers import ProductSerializer, CategorySerializer
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from .serializers import UserSerializer 
-from rest_framework import generics, permissions
-from .models import Product, Category, Order
-from .serializers import OrderHistorySerializer
-import stripe
 from django.conf import settings
-from rest_framework.views import APIView
-from .models import Collection
-from .serializers import CollectionSerializer, CollectionDetailSerializer
+from .models import Order, Collection
 from .serializers import ( # <-- Best practice to group imports
     ProductSerializer, 
     CategorySerializer, 
     UserSerializer, 
-    OrderSerializer 
+    OrderSerializer,
+    OrderHistorySerializer,
+    OrderBulkStatusSerializer,
+    CollectionSerializer,
+    CollectionDetailSerializer,
 )
+from .archive import order_history, load_orders
+from .idempotency import IdempotentCreateMixin
+from .throttling import RegisterRateThrottle, LoginRateThrottle, PaymentRateThrottle
 
 class CategoryListAPIView(generics.ListAPIView):
     queryset = Category.objects.all()
@@ -59,13 +74,36 @@ class ProductAPIView(generics.ListAPIView):
 class ProductDetailAPIView(generics.RetrieveAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+
+# "Frequently bought together", precomputed by `manage.py build_recommendations`
+class RelatedProductsAPIView(generics.ListAPIView):
+    serializer_class = ProductSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        # One query through the (product, rank) index on ProductRecommendation
+        return (
+            Product.objects.filter(recommended_for__product_id=self.kwargs['pk'], available=True)
+            .order_by('recommended_for__rank')
+        )
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Only an empty list needs the extra lookup, to tell "no recommendations yet" from "no such product"
+        if not response.data:
+            get_object_or_404(Product, pk=self.kwargs['pk'])
+        return response
  # New View for User Registration
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    throttle_classes = [RegisterRateThrottle]
 
 # We are extending the default login view to return the user's ID and email along with the token
 class CustomAuthToken(ObtainAuthToken):
+    # Each attempt runs a full password hash, so cap them before they reach it
+    throttle_classes = [LoginRateThrottle]
+
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data,
                                            context={'request': request})
@@ -78,7 +116,8 @@ class CustomAuthToken(ObtainAuthToken):
             'email': user.email
         })
 
-class OrderCreateAPIView(generics.CreateAPIView):
+# Retries carrying the same Idempotency-Key header get the original response back
+class OrderCreateAPIView(IdempotentCreateMixin, generics.CreateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated] # Ensures only logged-in users can create an order
@@ -100,16 +139,26 @@ class OrderListAPIView(generics.ListAPIView):
     def get_queryset(self):
         """
         This view should return a list of all the orders
-        for the currently authenticated user.
+        for the currently authenticated user, including archived ones.
         """
         user = self.request.user
-        return Order.objects.filter(user=user).order_by('-created') 
+        return order_history(user)
+
+    def list(self, request, *args, **kwargs):
+        # The paginator works on lightweight (id, created) rows from both the
+        # live and archive tables; only the orders on this page get loaded.
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(load_orders(page), many=True)
+        return self.get_paginated_response(serializer.data)
 
 class CreatePaymentIntentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [PaymentRateThrottle]
 
     def post(self, request, *args, **kwargs):
-        
+        # Imported here rather than at the top: the Stripe SDK is by far the
+        # slowest import in the project and only this view needs it.
+        import stripe
         stripe.api_key = settings.STRIPE_SECRET_KEY
         
         # The frontend will send a list of items
@@ -177,9 +226,30 @@ class OrderCancelAPIView(APIView):
         if time_since_creation > timedelta(hours=12):
             return Response({"error": "Cancellation window has passed (12 hours)."}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.status = 'cancelled'
-        order.save()
+        # Re-checks the status under a row lock, so a concurrent ship or
+        # cancel between the check above and here can't be overwritten
+        updated, _ = Order.bulk_transition([order.pk], 'cancelled', changed_by=request.user)
+        if not updated:
+            return Response({"error": "This order can no longer be cancelled."}, status=status.HTTP_400_BAD_REQUEST)
 
         # --- TODO: Here you would also add logic to refund the payment via Stripe ---
 
-        return Response({"success": "Order has been cancelled."}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"success": "Order has been cancelled."}, status=status.HTTP_200_OK)
+
+class OrderBulkStatusAPIView(APIView):
+    """
+    Staff only. Moves many orders to one status in a single UPDATE, e.g.
+    {"ids": [1, 2, 3], "status": "shipped"}. Orders whose current status
+    doesn't allow the transition are returned in "skipped".
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated, skipped = Order.bulk_transition(
+            serializer.validated_data['ids'],
+            serializer.validated_data['status'],
+            changed_by=request.user,
+        )
+        return Response({"updated": updated, "skipped": skipped}, status=status.HTTP_200_OK)